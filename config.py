@@ -4,6 +4,7 @@ from pathlib import Path
 
 
 NASA_POWER_API_BASE = "https://power.larc.nasa.gov/api/temporal/daily/point"
+NASA_POWER_API_REGIONAL_BASE = "https://power.larc.nasa.gov/api/temporal/daily/regional"
 NASA_POWER_S3_BASE = "https://nasa-power.s3.us-west-2.amazonaws.com/"
 
 # Known daily Zarr roots (LST) for POWER ARD on AWS S3 (public/anonymous)
@@ -18,12 +19,21 @@ MERRA2DAILY_ZARR_HINT = (
 # API Parameters
 NASA_POWER_API_PARAMS = "T2M_MAX,T2M_MIN,PRECTOTCORR,ALLSKY_SFC_SW_DWN"
 
+# Regional (bounding box) API limits, in degrees
+REGIONAL_MIN_SPAN = 2.0  # POWER rejects boxes narrower than this
+REGIONAL_MAX_SPAN = 10.0  # POWER rejects boxes wider than this
+REGIONAL_MAX_PARAMETERS = 1  # POWER regional daily requests accept a single parameter
+API_MAX_CONCURRENCY = 5  # simultaneous requests to the POWER API
+
 # Default variable sets
 SOLAR_VARS = ["ALLSKY_SFC_SW_DWN"]  # SRAD source (W m^-2) -> convert to MJ m^-2 d^-1
 MET_VARS = ["T2M", "T2M_MAX", "T2M_MIN", "PRECTOTCORR", "T2MDEW", "WS2M", "RH2M"]
 
 RenameMetVars = {"T2M_MAX": "TMAX", "T2M_MIN": "TMIN", "PRECTOTCORR": "RAIN"}
 RenameSolarVars = {"ALLSKY_SFC_SW_DWN": "SRAD_WM2"}
+# API responses carry no CHIRPS rain, so POWER precipitation fills the RAIN column
+# (AG community SRAD is already MJ m^-2 d^-1)
+RenameApiVars = {"T2M_MAX": "TMAX", "T2M_MIN": "TMIN", "PRECTOTCORR": "RAIN1", "ALLSKY_SFC_SW_DWN": "SRAD"}
 variable_map = {
         'T2M': 'T2M',    # Average temperature (°C)
         'TMAX': 'TMAX',  # Maximum temperature (°C)
@@ -50,7 +60,7 @@ TAV = -99.0  # Average temperature (°C)
 AMP = -99.0  # Temperature amplitude (°C)
 
 # Other constants
-META = """$WEATHER DATA : NASA POWER via S3/Zarr
+META_BODY = """
 
 ! T2M     Temperature at 2 Meters (C)
 ! TMIN     Temperature at 2 Meters Minimum (C)
@@ -61,4 +71,7 @@ META = """$WEATHER DATA : NASA POWER via S3/Zarr
 ! WIND     Wind Speed at 2 Meters (m/s)
 ! SRAD     All Sky Surface Shortwave Downward Irradiance (MJ/m^2/day)
 
-@ INSI   WTHLAT  WTHLONG   WELEV   TAV   AMP  REFHT  WNDHT"""
\ No newline at end of file
+@ INSI   WTHLAT  WTHLONG   WELEV   TAV   AMP  REFHT  WNDHT"""
+
+META = "$WEATHER DATA : NASA POWER via S3/Zarr" + META_BODY
+API_META = "$WEATHER DATA : NASA POWER via API" + META_BODY
\ No newline at end of file
@@ -0,0 +1,12 @@
+from pathlib import Path
+
+import pytest
+
+from weather_util import get_elevation, get_elevations
+
+
+def test_get_elevations_matches_single_lookups(monkeypatch):
+    monkeypatch.chdir(Path(__file__).resolve().parents[1])
+    sites = [(42.0, -93.5), (10.0, 10.0), (-33.9, 18.4)]
+    assert get_elevations(sites) == pytest.approx([get_elevation(lat, lon) for lat, lon in sites])
+    assert get_elevations([]) == []
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date
+
+import httpx
+import pytest
+
+import weather_via_API
+from weather_via_API import (_group_sites, _pad_range, _split_power_features,
+                             get_Daily_API_WTH_batch)
+
+FILL = -999.0
+SITES = [(42.0, -93.5), (42.3, -93.1), (41.7, -94.0), (42.8, -92.6), (41.2, -93.9)]
+
+
+def _feature(lat, lon, parameters):
+    return {"type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat, 100.0]},
+            "properties": {"parameter": parameters}}
+
+
+def _series(params, value):
+    return {p: {"20240101": value, "20240102": FILL} for p in params}
+
+
+def _grid(lat0, lat1, lon0, lon1, dlat, dlon):
+    """Cell centres covering the box, aligned to a global grid of the given spacing."""
+    lat = -90.0 + dlat / 2 + dlat * int((lat0 + 90.0) // dlat)
+    while lat <= lat1 + dlat:
+        lon = -180.0 + dlon / 2 + dlon * int((lon0 + 180.0) // dlon)
+        while lon <= lon1 + dlon:
+            yield round(lat, 4), round(lon, 4)
+            lon += dlon
+        lat += dlat
+
+
+class MockPower:
+    """Mock of the POWER point and regional daily endpoints.
+
+    Solar comes back on a 1 degree grid and meteorology on the 0.5 x 0.625 MERRA-2 grid.
+    """
+
+    def __init__(self, fail_regional=False):
+        self.fail_regional = fail_regional
+        self.calls = []
+
+    def __call__(self, request):
+        q = request.url.params
+        params = q["parameters"].split(",")
+        if request.url.path.endswith("/regional"):
+            lat0, lat1 = float(q["latitude-min"]), float(q["latitude-max"])
+            lon0, lon1 = float(q["longitude-min"]), float(q["longitude-max"])
+            if (self.fail_regional or len(params) != 1
+                    or not 2.0 <= lat1 - lat0 <= 10.0 or not 2.0 <= lon1 - lon0 <= 10.0):
+                self.calls.append(("rejected", params))
+                return httpx.Response(422, json={"messages": ["rejected"]})
+            self.calls.append(("regional", params))
+            spacing = (1.0, 1.0) if params == ["ALLSKY_SFC_SW_DWN"] else (0.5, 0.625)
+            features = [_feature(lat, lon, _series(params, lat))
+                        for lat, lon in _grid(lat0, lat1, lon0, lon1, *spacing)]
+            return httpx.Response(200, json={"type": "FeatureCollection", "features": features,
+                                             "header": {"fill_value": FILL}})
+        self.calls.append(("point", params))
+        lat, lon = float(q["latitude"]), float(q["longitude"])
+        payload = _feature(lat, lon, _series(params, lat))
+        payload["header"] = {"fill_value": FILL}
+        return httpx.Response(200, json=payload)
+
+
+@pytest.fixture(autouse=True)
+def _fixed_elevation(monkeypatch):
+    monkeypatch.setattr(weather_via_API, "get_elevations", lambda sites: [250.0] * len(sites))
+
+
+def _run_batch(mock, sites, **kwargs):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(mock)) as client:
+            return await get_Daily_API_WTH_batch(sites, date(2024, 1, 1), date(2024, 1, 2),
+                                                 client=client, **kwargs)
+    return asyncio.run(main())
+
+
+def _data_header(text):
+    return next(line for line in text.splitlines() if line.startswith("@  DATE"))
+
+
+def test_group_sites_splits_on_max_span():
+    clusters = _group_sites([(42.0, -93.5), (42.3, -93.1), (41.7, -94.0), (10.0, 10.0)])
+    assert sorted(len(c) for c in clusters) == [1, 3]
+    assert [(10.0, 10.0)] in clusters
+
+    clusters = _group_sites([(0.0, 0.0), (0.0, 10.0), (0.0, 10.5)])
+    assert sorted(len(c) for c in clusters) == [1, 2]
+
+
+def test_group_sites_normalizes_and_validates():
+    assert _group_sites([[42, -93.5], (42.0, -93.5)]) == [[(42.0, -93.5)]]
+    with pytest.raises(ValueError):
+        _group_sites([(91.0, 0.0)])
+    with pytest.raises(ValueError):
+        _group_sites([(0.0, -180.5)])
+
+
+def test_pad_range():
+    assert _pad_range(40.0, 45.0, 90.0) == (40.0, 45.0)
+    assert _pad_range(42.0, 42.5, 90.0) == (41.25, 43.25)
+    assert _pad_range(89.5, 90.0, 90.0) == (88.0, 90.0)
+    assert _pad_range(-90.0, -89.8, 90.0) == (-90.0, -88.0)
+    assert _pad_range(179.9, 180.0, 180.0) == (178.0, 180.0)
+    assert _pad_range(-180.0, -179.0, 180.0) == (-180.0, -178.0)
+
+
+def test_split_power_features_nearest_cell_and_fill_value():
+    params = ["T2M_MAX", "PRECTOTCORR"]
+    payload = {"features": [_feature(42.0, -93.75, _series(params, 1.0)),
+                            _feature(42.5, -93.125, _series(params, 2.0))],
+               "header": {"fill_value": FILL}}
+    out = _split_power_features([payload], [(41.9, -93.8), (42.4, -93.1)])
+    assert out[(41.9, -93.8)]["records"][0] == {"date": "20240101", "TMAX": 1.0, "RAIN1": 1.0}
+    assert out[(42.4, -93.1)]["records"][0]["TMAX"] == 2.0
+    assert out[(42.4, -93.1)]["records"][1] == {"date": "20240102", "TMAX": None, "RAIN1": None}
+
+
+def test_split_power_features_merges_parameters_on_different_grids():
+    met = {"features": [_feature(42.25, -93.75, _series(["T2M_MAX"], 1.0)),
+                        _feature(42.25, -93.125, _series(["T2M_MAX"], 2.0))]}
+    solar = {"features": [_feature(41.5, -93.5, _series(["ALLSKY_SFC_SW_DWN"], 15.0)),
+                          _feature(42.5, -93.5, _series(["ALLSKY_SFC_SW_DWN"], 16.0))]}
+    out = _split_power_features([met, solar], [(42.0, -93.7), (42.4, -93.2)])
+    assert out[(42.0, -93.7)]["records"][0] == {"date": "20240101", "TMAX": 1.0, "SRAD": 15.0}
+    assert out[(42.4, -93.2)]["records"][0] == {"date": "20240101", "TMAX": 2.0, "SRAD": 16.0}
+
+
+def test_clustered_sites_make_fewer_requests_than_points():
+    mock = MockPower()
+    out = _run_batch(mock, SITES[:3], include_met=False)
+    assert mock.calls == [("regional", ["ALLSKY_SFC_SW_DWN"])]
+    assert set(out) == set(SITES[:3])
+
+    mock = MockPower()
+    out = _run_batch(mock, SITES)
+    assert [kind for kind, _ in mock.calls] == ["regional"] * 4
+    assert len(mock.calls) < len(SITES)
+    # solar and met come back on different grids but every site gets every column
+    assert {_data_header(text) for text in out.values()} == {"@  DATE    TMAX    TMIN    SRAD    RAIN"}
+
+
+def test_small_cluster_uses_point_requests():
+    mock = MockPower()
+    _run_batch(mock, SITES[:3])
+    assert [kind for kind, _ in mock.calls] == ["point"] * 3
+
+
+def test_point_and_regional_output_match():
+    mock = MockPower()
+    out = _run_batch(mock, SITES + [(10.0, 10.0)])
+    kinds = [kind for kind, _ in mock.calls]
+    assert kinds.count("point") == 1 and kinds.count("regional") == 4
+    for text in out.values():
+        assert text.splitlines()[0] == "$WEATHER DATA : NASA POWER via API"
+    assert {_data_header(text) for text in out.values()} == {"@  DATE    TMAX    TMIN    SRAD    RAIN"}
+    assert out[(10.0, 10.0)].splitlines()[-2] == "2024001    10.0    10.0    10.0    10.0"
+    assert out[(10.0, 10.0)].splitlines()[-1] == "2024002   -99.0   -99.0   -99.0   -99.0"
+
+
+def test_failed_region_falls_back_to_points():
+    mock = MockPower(fail_regional=True)
+    out = _run_batch(mock, SITES)
+    assert set(out) == set(SITES)
+    assert [kind for kind, _ in mock.calls].count("point") == len(SITES)
@@ -5,7 +5,7 @@ import fsspec
 import s3fs
 from pathlib import Path
 from datetime import date, datetime
-from typing import Any, Dict, Iterable
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from config import ELEVATION_FILE, META, NASA_POWER_S3_BASE, variable_map
 from config import ELEVATION, REFHT, WNDHT, TAV, AMP
 
@@ -64,13 +64,15 @@ def _transform_values(df: pd.DataFrame, out: Dict[str, Any]) -> Dict[str, Any]:
 
 def convert_to_wth_format(data_dict: Dict[str, Any], 
                          station_name: str = "S3PWR",
-                         elevation: float = 0.0) -> str:
+                         elevation: Optional[float] = None,
+                         meta: str = META) -> str:
     """Convert NASA POWER data to ICASA .wth format.
     
     Args:
         data_dict: Dictionary with 'records' key containing daily data
         station_name: 4-character station identifier
-        elevation: Station elevation in meters
+        elevation: Station elevation in meters; looked up from the WELEV grid when None
+        meta: Header block written above the station line
         
     Returns:
         String in ICASA .wth format
@@ -87,11 +89,11 @@ def convert_to_wth_format(data_dict: Dict[str, Any],
     longitude = data_dict.get("longitude", 0.0)
 
     # get elevation data
-    ELEVATION = get_elevation(latitude, longitude)
+    ELEVATION = get_elevation(latitude, longitude) if elevation is None else elevation
     
     # Build header
     wth_lines = []
-    wth_lines.append(META)
+    wth_lines.append(meta)
     # Use consistent field widths that can handle negative values and larger numbers
     # INSI: 6 chars, WTHLAT: 8 chars, WTHLONG: 8 chars, WELEV: 7 chars, TAV: 5 chars, AMP: 5 chars, REFHT: 6 chars, WNDHT: 6 chars
     wth_lines.append(f"  {station_name:>4} {latitude:>8.1f} {longitude:>8.1f} {ELEVATION:>7.2f} {TAV:>5.1f} {AMP:>5.1f} {REFHT:>6.0f} {WNDHT:>6.0f}")
@@ -188,4 +190,24 @@ def get_elevation(lat: float, lon: float) -> float:
     # Interpolate to exact coordinates
     elevation = welev_data.interp(y=lat, x=lon, method='linear')
     
-    return elevation.values.item()
\ No newline at end of file
+    return elevation.values.item()
+
+def get_elevations(sites: List[Tuple[float, float]]) -> List[float]:
+    """
+    Get elevations for many (latitude, longitude) sites with a single read of the WELEV grid.
+
+    Parameters:
+        sites (list): (latitude, longitude) pairs.
+
+    Returns:
+        list: Elevation in meters for each site, in input order.
+    """
+    if not sites:
+        return []
+    lats = xr.DataArray([lat for lat, _ in sites], dims="site")
+    lons = xr.DataArray([lon for _, lon in sites], dims="site")
+
+    with xr.open_dataset(ELEVATION_FILE) as ds:
+        # Interpolate all sites pointwise in one call
+        elevation = ds['WELEV'].interp(y=lats, x=lons, method='linear')
+        return [float(v) for v in elevation.values]
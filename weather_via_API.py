@@ -1,15 +1,48 @@
 from __future__ import annotations
+import asyncio
+import json
 from datetime import date
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import httpx
-from config import NASA_POWER_API_BASE, NASA_POWER_API_PARAMS
+from config import NASA_POWER_API_BASE, NASA_POWER_API_REGIONAL_BASE, NASA_POWER_API_PARAMS
+from config import REGIONAL_MIN_SPAN, REGIONAL_MAX_SPAN, REGIONAL_MAX_PARAMETERS
+from config import API_MAX_CONCURRENCY, API_META, RenameApiVars
+from weather_util import convert_to_wth_format, get_elevations
 
-async def make_nasa_request(params: Dict[str, Any]) -> str:
-    """Make a request to the NASA POWER API with proper error handling."""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(NASA_POWER_API_BASE, params=params, timeout=60.0)
-        response.raise_for_status()
-        return response.text
+Site = Tuple[float, float]
+
+async def make_nasa_request(params: Dict[str, Any],
+                            url: str = NASA_POWER_API_BASE,
+                            client: Optional[httpx.AsyncClient] = None) -> str:
+    """Make a request to the NASA POWER API with proper error handling.
+
+    Pass `client` to reuse one connection pool across several requests.
+    """
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            return await make_nasa_request(params, url, client)
+    response = await client.get(url, params=params, timeout=60.0)
+    response.raise_for_status()
+    return response.text
+
+
+def _select_parameters(include_srad: bool, include_met: bool) -> str:
+    """Build the comma-separated POWER parameter list for the requested groups."""
+    if not include_srad and not include_met:
+        raise ValueError("At least one of include_srad or include_met must be True.")
+
+    # Start with all parameters
+    parameters = NASA_POWER_API_PARAMS
+
+    # Filter out SRAD parameter if not requested
+    if not include_srad:
+        parameters = ",".join([p for p in parameters.split(",") if p != "ALLSKY_SFC_SW_DWN"])
+
+    # Filter out meteorological parameters if not requested
+    if not include_met:
+        parameters = ",".join([p for p in parameters.split(",") if p not in ["T2M_MAX", "T2M_MIN", "PRECTOTCORR"]])
+
+    return parameters
 
 
 async def get_Daily_API_WTH(latitude: float,
@@ -20,24 +53,13 @@ async def get_Daily_API_WTH(latitude: float,
                               include_met: bool = True,
                               community: str = "ag",
                               fmt: str = "icasa",
-                              header: bool = True) -> str:
+                              header: bool = True,
+                              client: Optional[httpx.AsyncClient] = None) -> str:
     """Fetch daily data from the NASA POWER API (AG community).
 
     Returns ICASA format data as text when fmt='icasa'.
     """
-    if not include_srad and not include_met:
-        raise ValueError("At least one of include_srad or include_met must be True.")
-    
-    # Start with all parameters
-    parameters = NASA_POWER_API_PARAMS
-    
-    # Filter out SRAD parameter if not requested
-    if not include_srad:
-        parameters = ",".join([p for p in parameters.split(",") if p != "ALLSKY_SFC_SW_DWN"])
-    
-    # Filter out meteorological parameters if not requested
-    if not include_met:
-        parameters = ",".join([p for p in parameters.split(",") if p not in ["T2M_MAX", "T2M_MIN", "PRECTOTCORR"]])
+    parameters = _select_parameters(include_srad, include_met)
 
     params = {
         "start": start_date.strftime("%Y%m%d"),
@@ -50,5 +72,193 @@ async def get_Daily_API_WTH(latitude: float,
         "header": header,
     }
 
-    return await make_nasa_request(params)
+    return await make_nasa_request(params, client=client)
+
+
+def _normalize_sites(sites: Iterable[Iterable[float]]) -> List[Site]:
+    """Convert sites to unique (latitude, longitude) float tuples, validating their ranges."""
+    out: Dict[Site, None] = {}
+    for site in sites:
+        lat, lon = (float(v) for v in site)
+        if not -90.0 <= lat <= 90.0:
+            raise ValueError(f"Latitude {lat} out of range (-90 to 90).")
+        if not -180.0 <= lon <= 180.0:
+            raise ValueError(f"Longitude {lon} out of range (-180 to 180).")
+        out[(lat, lon)] = None
+    return list(out)
+
+
+def _group_sites(sites: Iterable[Site],
+                 max_span: float = REGIONAL_MAX_SPAN) -> List[List[Site]]:
+    """Greedily group sites into clusters whose bounding box fits within `max_span` degrees."""
+    clusters: List[List[Site]] = []
+    bounds: List[List[float]] = []  # [lat_min, lat_max, lon_min, lon_max] per cluster
+    for lat, lon in sorted(_normalize_sites(sites)):
+        for cluster, box in zip(clusters, bounds):
+            lat_min, lat_max = min(box[0], lat), max(box[1], lat)
+            lon_min, lon_max = min(box[2], lon), max(box[3], lon)
+            if lat_max - lat_min <= max_span and lon_max - lon_min <= max_span:
+                cluster.append((lat, lon))
+                box[:] = [lat_min, lat_max, lon_min, lon_max]
+                break
+        else:
+            clusters.append([(lat, lon)])
+            bounds.append([lat, lat, lon, lon])
+    return clusters
+
+
+def _pad_range(low: float, high: float, limit: float) -> Tuple[float, float]:
+    """Widen [low, high] to at least REGIONAL_MIN_SPAN degrees, staying within +/- limit."""
+    if high - low >= REGIONAL_MIN_SPAN:
+        return low, high
+    center = (low + high) / 2.0
+    low = max(center - REGIONAL_MIN_SPAN / 2.0, -limit)
+    high = min(low + REGIONAL_MIN_SPAN, limit)
+    low = high - REGIONAL_MIN_SPAN
+    return low, high
+
+
+def _regional_bbox(cluster: List[Site]) -> Dict[str, float]:
+    """Bounding box query parameters for the regional endpoint covering `cluster`."""
+    lats = [lat for lat, _ in cluster]
+    lons = [lon for _, lon in cluster]
+    lat_min, lat_max = _pad_range(min(lats), max(lats), 90.0)
+    lon_min, lon_max = _pad_range(min(lons), max(lons), 180.0)
+    return {
+        "latitude-min": lat_min,
+        "latitude-max": lat_max,
+        "longitude-min": lon_min,
+        "longitude-max": lon_max,
+    }
+
+
+def _split_power_features(payloads: List[Dict[str, Any]],
+                          cluster: List[Site]) -> Dict[Site, Dict[str, Any]]:
+    """Split POWER GeoJSON responses into one WTH-like dictionary per site.
+
+    Each payload is a point Feature or a regional FeatureCollection, possibly for
+    different parameters on different grids. For every payload a site takes the
+    values of its nearest grid cell; the records are then merged by date.
+    """
+    records: Dict[Site, Dict[str, Dict[str, Any]]] = {site: {} for site in cluster}
+    for payload in payloads:
+        features = payload["features"] if "features" in payload else [payload]
+        if not features:
+            raise ValueError(f"No grid cells in POWER response: {payload.get('messages', payload)}")
+        fill_value = payload.get("header", {}).get("fill_value", -999.0)
+
+        # grid cell centres as (lat, lon); POWER returns coordinates as [lon, lat, elev]
+        cells = [(f["geometry"]["coordinates"][1], f["geometry"]["coordinates"][0]) for f in features]
+
+        for lat, lon in cluster:
+            nearest = min(range(len(cells)),
+                          key=lambda i: (cells[i][0] - lat) ** 2 + (cells[i][1] - lon) ** 2)
+            site_records = records[(lat, lon)]
+            for nasa_var, series in features[nearest]["properties"]["parameter"].items():
+                name = RenameApiVars.get(nasa_var, nasa_var)
+                for day, value in series.items():
+                    record = site_records.setdefault(day, {"date": day})
+                    record[name] = None if value is None or value == fill_value else round(float(value), 1)
+
+    return {
+        (lat, lon): {
+            "source": "api",
+            "latitude": lat,
+            "longitude": lon,
+            "records": [site_records[day] for day in sorted(site_records)],
+        }
+        for (lat, lon), site_records in records.items()
+    }
+
+
+def _convert_sites(per_site: Dict[Site, Dict[str, Any]]) -> Dict[Site, str]:
+    """Convert per-site WTH-like dictionaries to ICASA text, reading the elevation grid once."""
+    sites = list(per_site)
+    elevations = get_elevations(sites)
+    return {site: convert_to_wth_format(per_site[site], "NASA", elevation, meta=API_META)
+            for site, elevation in zip(sites, elevations)}
+
+
+async def get_Daily_API_WTH_batch(sites: Iterable[Iterable[float]],
+                                  start_date: date,
+                                  end_date: date,
+                                  include_srad: bool = True,
+                                  include_met: bool = True,
+                                  community: str = "ag",
+                                  max_concurrency: int = API_MAX_CONCURRENCY,
+                                  client: Optional[httpx.AsyncClient] = None) -> Dict[Site, str]:
+    """Fetch daily ICASA data for many (latitude, longitude) sites with few API round-trips.
+
+    Nearby sites are grouped into bounding boxes of at most REGIONAL_MAX_SPAN degrees.
+    A box costs one regional request per REGIONAL_MAX_PARAMETERS parameters, so it is
+    fetched from the regional endpoint only when it holds more sites than that;
+    otherwise, or when a regional request fails, its sites are fetched with point
+    requests. Point and regional sites produce the same ICASA layout.
+    At most `max_concurrency` requests are in flight at once.
+
+    Returns a dict mapping each (latitude, longitude) float tuple to its ICASA text.
+    Sites whose point request also fails are reported and left out of the result.
+    """
+    parameters = _select_parameters(include_srad, include_met).split(",")
+    chunks = [parameters[i:i + REGIONAL_MAX_PARAMETERS]
+              for i in range(0, len(parameters), REGIONAL_MAX_PARAMETERS)]
+    common = {
+        "start": start_date.strftime("%Y%m%d"),
+        "end": end_date.strftime("%Y%m%d"),
+        "community": community,
+        "format": "json",
+    }
+    clusters = _group_sites(sites)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _get_json(http: httpx.AsyncClient, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return json.loads(await make_nasa_request(params, url, http))
+
+    async def _fetch_point(http: httpx.AsyncClient, site: Site) -> Dict[Site, Dict[str, Any]]:
+        params = {**common, "latitude": site[0], "longitude": site[1], "parameters": ",".join(parameters)}
+        try:
+            payload = await _get_json(http, NASA_POWER_API_BASE, params)
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            print(f"Error occurred while fetching data from API for site {site}: {e}")
+            return {}
+        return _split_power_features([payload], [site])
+
+    async def _fetch_points(http: httpx.AsyncClient, cluster: List[Site]) -> Dict[Site, Dict[str, Any]]:
+        per_site: Dict[Site, Dict[str, Any]] = {}
+        for part in await asyncio.gather(*(_fetch_point(http, site) for site in cluster)):
+            per_site.update(part)
+        return per_site
+
+    async def _fetch_region(http: httpx.AsyncClient, cluster: List[Site]) -> Dict[Site, Dict[str, Any]]:
+        bbox = _regional_bbox(cluster)
+        payloads = await asyncio.gather(
+            *(_get_json(http, NASA_POWER_API_REGIONAL_BASE, {**common, **bbox, "parameters": ",".join(chunk)})
+              for chunk in chunks),
+            return_exceptions=True)
+        errors = [p for p in payloads if isinstance(p, (httpx.HTTPError, json.JSONDecodeError))]
+        if errors:
+            print(f"Error occurred while fetching regional data from API: {errors[0]}")
+            print(f"Warning: Falling back to point requests for {len(cluster)} sites.")
+            return await _fetch_points(http, cluster)
+        for payload in payloads:
+            if isinstance(payload, BaseException):
+                raise payload
+        return _split_power_features(payloads, cluster)
+
+    async def _run(http: httpx.AsyncClient) -> Dict[Site, str]:
+        tasks = []
+        for cluster in clusters:
+            if len(cluster) > len(chunks):
+                tasks.append(_fetch_region(http, cluster))
+            else:
+                tasks.append(_fetch_points(http, cluster))
+        per_site: Dict[Site, Dict[str, Any]] = {}
+        for part in await asyncio.gather(*tasks):
+            per_site.update(part)
+        return await asyncio.to_thread(_convert_sites, per_site)
 
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            return await _run(client)
+    return await _run(client)
@@ -118,6 +118,6 @@ async def get_Daily_S3_WTH(
     data_dict = _transform_values(df, out)
 
     # Convert to ICASA format
-    icasa_format_data = convert_to_wth_format(data_dict, "NASA", 40.0)
+    icasa_format_data = convert_to_wth_format(data_dict, "NASA")
 
     return icasa_format_data